@@ -0,0 +1,146 @@
+# backend/admission.py
+# Admission control: per-key token-bucket rate limiting + bounded priority queue with deadline-aware shedding.
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+PRIORITY_CLASSES = {"interactive": 0, "batch": 1}
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+# === Per-Key Rate Limiting ===
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Consume one token; return 0 if allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self.stats = {"rate_limited_total": 0}
+
+    def check(self, key: str):
+        if self.rate <= 0:
+            return
+        bucket = self._buckets.pop(key, None) or TokenBucket(self.rate, self.burst)
+        self._buckets[key] = bucket  # LRU order; drop the stalest key when full
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        wait = bucket.take()
+        if wait > 0:
+            self.stats["rate_limited_total"] += 1
+            raise AdmissionRejected(429, "Rate limit exceeded for this API key", wait)
+
+
+# === Concurrency Limit + Priority Queue ===
+class AdmissionController:
+    def __init__(self, max_concurrency: int, max_queue: int, expected_service_s: float):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.service_ewma = expected_service_s  # running estimate of one pipeline run
+        self._active = 0
+        self._queued = 0
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self.stats = {
+            "admitted_total": 0,
+            "shed_queue_full_total": 0,
+            "shed_deadline_total": 0,
+            "expired_in_queue_total": 0,
+        }
+
+    def estimated_wait(self, priority: int) -> float:
+        if self._active < self.max_concurrency and not self._queued:
+            return 0.0
+        ahead = sum(1 for p, _, fut in self._waiters if p <= priority and not fut.done())
+        return (ahead // self.max_concurrency + 1) * self.service_ewma
+
+    def _release(self, elapsed: float):
+        self.service_ewma = 0.8 * self.service_ewma + 0.2 * elapsed
+        self._handoff()
+
+    def _handoff(self):
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(True)  # hand the slot straight to the next waiter
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int, deadline_s: float):
+        """Hold one pipeline slot; raise AdmissionRejected if it cannot start in time to meet the deadline."""
+        if self._active < self.max_concurrency and not self._queued:
+            self._active += 1
+        else:
+            if self._queued >= self.max_queue:
+                self.stats["shed_queue_full_total"] += 1
+                raise AdmissionRejected(503, "Server overloaded: queue is full", self.service_ewma)
+
+            wait = self.estimated_wait(priority)
+            budget = deadline_s - self.service_ewma
+            if wait > budget:
+                self.stats["shed_deadline_total"] += 1
+                raise AdmissionRejected(503, "Server overloaded: request cannot meet its deadline", wait)
+
+            fut = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+            self._queued += 1
+            try:
+                await asyncio.wait_for(fut, timeout=budget)
+            except asyncio.TimeoutError:
+                # Python 3.12+ wait_for can time out after the slot was handed over: pass it on
+                if fut.done() and not fut.cancelled():
+                    self._handoff()
+                self.stats["expired_in_queue_total"] += 1
+                raise AdmissionRejected(503, "Server overloaded: deadline expired while queued", self.service_ewma)
+            except asyncio.CancelledError:
+                # Cancelled just after being handed a slot: pass it on rather than leak it
+                if fut.done() and not fut.cancelled():
+                    self._handoff()
+                raise
+            finally:
+                self._queued -= 1
+
+        self.stats["admitted_total"] += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - start)
+
+    def metrics(self) -> dict:
+        return {
+            **self.stats,
+            "active": self._active,
+            "queued": self._queued,
+            "service_ewma_s": round(self.service_ewma, 3),
+        }
@@ -0,0 +1,51 @@
+# backend/coalesce.py
+# In-flight request coalescing (singleflight): concurrent identical queries share one pipeline run.
+
+import asyncio
+import json
+from fastapi.concurrency import run_in_threadpool
+
+
+def normalise_query(query: str) -> str:
+    return " ".join(query.lower().split()).rstrip("?!. ")
+
+
+def coalesce_key(query: str, metadata: dict = None, index: str = None) -> str:
+    # Document scope is the caller's metadata (e.g. doc_title) plus the active index, so a
+    # request arriving after an index swap never joins a run still reading the old one
+    scope = json.dumps(metadata or {}, sort_keys=True, default=str)
+    return f"{normalise_query(query)}\x00{scope}\x00{index or ''}"
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight = {}
+        self.stats = {"leaders_total": 0, "coalesced_total": 0, "errors_total": 0}
+
+    def _done(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["errors_total"] += 1
+
+    async def do(self, key: str, fn, *args):
+        """Run fn(*args) (awaited if async, else in the threadpool), or join the identical call already in flight."""
+        task = self._inflight.get(key)
+        if task is None:
+            # Detached task: a disconnecting leader must not cancel the run its followers wait on
+            if asyncio.iscoroutinefunction(fn):
+                task = asyncio.ensure_future(fn(*args))
+            else:
+                task = asyncio.ensure_future(run_in_threadpool(fn, *args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+            self.stats["leaders_total"] += 1
+        else:
+            self.stats["coalesced_total"] += 1
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    def metrics(self) -> dict:
+        return {**self.stats, "in_flight": len(self._inflight)}
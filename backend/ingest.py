@@ -0,0 +1,160 @@
+# backend/ingest.py
+# Background ingestion jobs: chunk + embed uploaded documents into a fresh versioned
+# collection, then atomically switch queries over to it (blue/green) with rollback.
+
+import os
+import multiprocessing
+import shutil
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import ragqexec
+from backend.ingest_worker import init_worker, chunk_file, embed_batch
+
+INGEST_WORKERS = int(os.getenv("NDRA_INGEST_WORKERS", 1))
+UPLOAD_DIR = os.getenv("NDRA_UPLOAD_DIR", "uploads")
+EMBED_BATCH = 256
+COPY_BATCH = 1000
+
+# CPU work runs in separate niced processes; a single coordinator thread does the
+# Chroma I/O and runs jobs one at a time so two swaps can never interleave.
+_worker_pool = None
+_coordinator = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ndra-ingest")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _worker_pool
+    if _worker_pool is None:
+        # spawn, not fork: the server process already runs the event loop, threadpools and
+        # open Chroma/HTTP connections, and forking that (or torch) can deadlock the child
+        _worker_pool = ProcessPoolExecutor(
+            max_workers=INGEST_WORKERS,
+            initializer=init_worker,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _worker_pool
+
+
+def _update(job_id: str, **fields):
+    with _jobs_lock:
+        _jobs[job_id].update(fields, updated_at=time.time())
+
+
+def get_job(job_id: str) -> dict:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def list_jobs() -> list[dict]:
+    with _jobs_lock:
+        return [dict(job) for job in _jobs.values()]
+
+
+def job_dir(job_id: str) -> str:
+    return os.path.join(UPLOAD_DIR, job_id)
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def submit_job(job_id: str, file_paths: list[str], chunk_size: int = 500, overlap: int = 100,
+               mode: str = "append", activate: bool = True) -> dict:
+    """Queue an ingestion job. mode="append" carries over the active index; "replace" indexes only these files."""
+    if mode not in ("append", "replace"):
+        raise ValueError(f"Unsupported ingestion mode: {mode}")
+    job = {
+        "job_id": job_id,
+        "status": "queued",
+        "stage": None,
+        "progress": 0.0,
+        "files": [os.path.basename(p) for p in file_paths],
+        "chunk_size": chunk_size,
+        "overlap": overlap,
+        "mode": mode,
+        "activate": activate,
+        "collection": f"ndr_chunks_{job_id}",
+        "base_collection": None,
+        "chunks": 0,
+        "error": None,
+        "created_at": time.time(),
+        "updated_at": time.time(),
+    }
+    with _jobs_lock:
+        _jobs[job_id] = job
+    _coordinator.submit(_run_job, job_id, file_paths)
+    return dict(job)
+
+
+def _copy_active(source, target, job_id: str) -> int:
+    total = source.count()
+    for offset in range(0, total, COPY_BATCH):
+        batch = source.get(limit=COPY_BATCH, offset=offset, include=["documents", "embeddings", "metadatas"])
+        if batch["ids"]:
+            target.add(ids=batch["ids"], documents=batch["documents"],
+                       embeddings=batch["embeddings"], metadatas=batch["metadatas"])
+        _update(job_id, progress=round(0.1 * min(offset + COPY_BATCH, total) / total, 3))
+    return total
+
+
+def _run_job(job_id: str, file_paths: list[str]):
+    job = get_job(job_id)
+    name = job["collection"]
+    target = None
+    try:
+        _update(job_id, status="running", stage="copying" if job["mode"] == "append" else "chunking")
+        # The swap later only goes ahead if this is still the active index
+        base_name, base = ragqexec.active_collection()
+        _update(job_id, base_collection=base_name)
+        target = ragqexec.chroma_client.create_collection(name=name)
+        copied = _copy_active(base, target, job_id) if job["mode"] == "append" else 0
+
+        # Chunking: one file per worker task (parsed text is cached by chunks.load_pages)
+        _update(job_id, stage="chunking")
+        pool = _pool()
+        futures = [pool.submit(chunk_file, p, job["chunk_size"], job["overlap"]) for p in file_paths]
+        all_chunks = []
+        for i, future in enumerate(futures, 1):
+            all_chunks.extend(future.result())
+            _update(job_id, progress=round(0.1 + 0.2 * i / len(futures), 3))
+
+        # Embedding + write, batch by batch
+        _update(job_id, stage="embedding", chunks=len(all_chunks))
+        batches = [all_chunks[i:i + EMBED_BATCH] for i in range(0, len(all_chunks), EMBED_BATCH)]
+        futures = [pool.submit(embed_batch, [c["text"] for c in batch]) for batch in batches]
+        written = 0
+        for batch, future in zip(batches, futures):
+            target.add(
+                ids=[f"{job_id}-{written + j}" for j in range(len(batch))],
+                documents=[c["text"] for c in batch],
+                embeddings=future.result(),
+                metadatas=[{k: v for k, v in c["metadata"].items() if v is not None} for c in batch],
+            )
+            written += len(batch)
+            _update(job_id, progress=round(0.3 + 0.65 * written / len(all_chunks), 3))
+
+        expected = copied + written
+        if target.count() < expected:
+            raise RuntimeError(f"Index build incomplete: {target.count()} of {expected} records")
+
+        if job["activate"]:
+            _update(job_id, stage="swapping")
+            ragqexec.activate_collection(name, expected_active=base_name)
+        _update(job_id, status="completed", stage=None, progress=1.0)
+    except Exception as e:
+        print("Ingestion Error:", traceback.format_exc())
+        _update(job_id, status="failed", error=str(e))
+        if target is not None:
+            try:
+                ragqexec.chroma_client.delete_collection(name=name)
+            except Exception:
+                pass
+    finally:
+        # Uploaded files are only needed for the build itself
+        shutil.rmtree(job_dir(job_id), ignore_errors=True)
@@ -0,0 +1,38 @@
+# backend/ingest_worker.py
+# CPU-bound ingestion steps, run inside the low-priority ingestion process pool.
+# Kept free of server imports so worker processes start cheaply.
+
+import os
+from vectorstore import EMBED_MODEL
+
+INGEST_NICE = int(os.getenv("NDRA_INGEST_NICE", 10))
+INGEST_THREADS = int(os.getenv("NDRA_INGEST_THREADS", 1))
+
+_model = None
+
+
+def init_worker():
+    # Yield CPU to query serving: lower scheduling priority and cap BLAS/torch threads
+    try:
+        os.nice(INGEST_NICE)
+    except (AttributeError, OSError):
+        pass
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(INGEST_THREADS)
+
+
+def chunk_file(file_path: str, chunk_size: int, overlap: int) -> list[dict]:
+    from chunks import load_pages, chunk_pages
+    # Parse in this (niced) worker only: no nested per-page process pool
+    return chunk_pages(load_pages(file_path, workers=1), os.path.basename(file_path), chunk_size, overlap)
+
+
+def embed_batch(texts: list[str]) -> list[list[float]]:
+    global _model
+    if _model is None:
+        import torch
+        from sentence_transformers import SentenceTransformer
+        torch.set_num_threads(INGEST_THREADS)
+        _model = SentenceTransformer(EMBED_MODEL)
+    embeddings = _model.encode(texts, show_progress_bar=False)
+    return embeddings.tolist() if hasattr(embeddings, "tolist") else embeddings
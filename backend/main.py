@@ -1,11 +1,19 @@
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, UploadFile, File, Form
 from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.responses import HTMLResponse
 from datetime import datetime
 from pydantic import BaseModel
-from backend.models import QueryRequest, QueryResponse
+from backend.models import QueryRequest, QueryResponse, IndexActivateRequest
+from backend.coalesce import SingleFlight, coalesce_key
+from backend.admission import AdmissionController, AdmissionRejected, RateLimiter, PRIORITY_CLASSES
+from fastapi.concurrency import run_in_threadpool
 from ragqexec import run_pipeline  # You will patch this next
+import ragqexec
+from backend import ingest
+from typing import List
 import os
+import math
+import shutil
 from dotenv import load_dotenv
 # Importing the necessary libraries
 import chromadb
@@ -15,22 +23,55 @@ from chromadb.config import Settings
 load_dotenv()
 API_KEY = os.getenv("NDRA_API_KEY")
 
+# Admission control / load shedding
+MAX_CONCURRENCY = int(os.getenv("NDRA_MAX_CONCURRENCY", 4))
+MAX_QUEUE = int(os.getenv("NDRA_MAX_QUEUE", 32))
+EXPECTED_SERVICE_S = float(os.getenv("NDRA_EXPECTED_SERVICE_S", 5))
+DEFAULT_DEADLINE_S = float(os.getenv("NDRA_DEFAULT_DEADLINE_S", 30))
+# Per-client rate limit on /hackrx/run; off unless NDRA_RATE_PER_SEC > 0
+RATE_PER_SEC = float(os.getenv("NDRA_RATE_PER_SEC", 0))
+RATE_BURST = float(os.getenv("NDRA_RATE_BURST", 10))
+
+# Optional per-client keys, "name:key,name:key". Each accepted in addition to NDRA_API_KEY
+# and rate-limited under its own name; everyone else is limited by client IP
+# (run uvicorn with --proxy-headers behind a trusted proxy so this is the real caller).
+CLIENT_KEYS = {
+    key.strip(): name.strip()
+    for name, _, key in (entry.partition(":") for entry in os.getenv("NDRA_CLIENT_KEYS", "").split(","))
+    if name.strip() and key.strip()
+}
+
 app = FastAPI(
     title="Neuro-Semantic Document Research Assistance (NDRA)",
     description="Semantic Query Interface for Policy Documents",
     version="1.0.0"
 )
 
+# Identical in-flight /hackrx/run requests share one pipeline run
+pipeline_flight = SingleFlight()
+admission = AdmissionController(MAX_CONCURRENCY, MAX_QUEUE, EXPECTED_SERVICE_S)
+rate_limiter = RateLimiter(RATE_PER_SEC, RATE_BURST)
+
 @app.middleware("http")
 async def verify_token(request: Request, call_next):
     # Skip token check for root or favicon
     if request.url.path not in ["/", "/favicon.ico", "/ndrahackrx", "/docs", "/redoc", "/openapi.json"]:
-        if API_KEY:
-            token = request.headers.get("Authorization")
-            if token != f"Bearer {API_KEY}":
+        if API_KEY or CLIENT_KEYS:
+            token = request.headers.get("Authorization") or ""
+            # Master key only counts when it is actually configured (never "Bearer None")
+            master_ok = bool(API_KEY) and token == f"Bearer {API_KEY}"
+            client_ok = token.startswith("Bearer ") and token[len("Bearer "):] in CLIENT_KEYS
+            if not (master_ok or client_ok):
                 return JSONResponse(status_code=403, content={"error": "Unauthorised Access, Get an Auth Token From Administrator"})
     return await call_next(request)
 
+def client_identity(request: Request) -> str:
+    # Only server-issued identities: a known per-client key's name, else the client address
+    token = request.headers.get("Authorization") or ""
+    if token.startswith("Bearer ") and token[len("Bearer "):] in CLIENT_KEYS:
+        return f"key:{CLIENT_KEYS[token[len('Bearer '):]]}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
 @app.get("/", response_class=PlainTextResponse)
 async def root():
     return "✅ NDRA API is up and running."
@@ -40,13 +81,113 @@ async def favicon():
     return PlainTextResponse("", status_code=204)
 
 @app.post("/hackrx/run", response_model=QueryResponse)
-async def ndra_run(query_input: QueryRequest):
+async def ndra_run(query_input: QueryRequest, request: Request):
+    try:
+        rate_limiter.check(client_identity(request))
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+    # X-Priority: interactive (default) | batch ; X-Request-Deadline: seconds the client will wait
+    priority = PRIORITY_CLASSES.get(request.headers.get("X-Priority", "interactive").lower(), 0)
     try:
-        result = run_pipeline(query_input.query, query_input.metadata)
-        return result
+        deadline = float(request.headers.get("X-Request-Deadline", DEFAULT_DEADLINE_S))
+    except ValueError:
+        deadline = float("nan")
+    if not math.isfinite(deadline) or deadline <= 0:
+        raise HTTPException(status_code=400, detail="X-Request-Deadline must be a positive number of seconds")
+    deadline = min(deadline, DEFAULT_DEADLINE_S)  # clients may ask for less time, never more
+
+    async def admitted_run():
+        async with admission.slot(priority, deadline):
+            return await run_in_threadpool(run_pipeline, query_input.query, query_input.metadata)
+
+    try:
+        key = coalesce_key(query_input.query, query_input.metadata, ragqexec.active_collection()[0])
+        # A coalesced group is admitted with the leader's priority and deadline. If the
+        # leader gets shed, a follower retries once under its own priority and deadline.
+        joined = pipeline_flight.in_flight(key)
+        try:
+            shared = await pipeline_flight.do(key, admitted_run)
+        except AdmissionRejected:
+            if not joined:
+                raise
+            shared = await pipeline_flight.do(key, admitted_run)
+        # Coalesced callers share one result object; give each its own copy with its own wording
+        copy = getattr(shared, "model_copy", None) or shared.copy
+        return copy(update={"question": query_input.query})
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Pipeline failed: {str(e)}")
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "coalescing": pipeline_flight.metrics(),
+        "admission": admission.metrics(),
+        "rate_limit": rate_limiter.stats,
+    }
+
+# --- Ingestion Jobs & Index Management ---
+SUPPORTED_UPLOADS = {".pdf", ".txt", ".md", ".docx"}
+
+@app.post("/ingest/jobs", status_code=202)
+async def create_ingest_job(
+    files: List[UploadFile] = File(...),
+    chunk_size: int = Form(500),
+    overlap: int = Form(100),
+    mode: str = Form("append"),
+    activate: bool = Form(True),
+):
+    for upload in files:
+        ext = os.path.splitext(upload.filename or "")[1].lower()
+        if ext not in SUPPORTED_UPLOADS:
+            raise HTTPException(status_code=400, detail=f"Unsupported file type: {upload.filename}")
+    if mode not in ("append", "replace"):
+        raise HTTPException(status_code=400, detail=f"Unsupported ingestion mode: {mode}")
+
+    job_id = ingest.new_job_id()
+    upload_dir = ingest.job_dir(job_id)
+    os.makedirs(upload_dir, exist_ok=True)
+    file_paths = []
+    for upload in files:
+        path = os.path.join(upload_dir, os.path.basename(upload.filename))
+        with open(path, "wb") as f:
+            shutil.copyfileobj(upload.file, f)
+        file_paths.append(path)
+
+    return ingest.submit_job(job_id, file_paths, chunk_size, overlap, mode, activate)
+
+@app.get("/ingest/jobs")
+async def list_ingest_jobs():
+    return ingest.list_jobs()
+
+@app.get("/ingest/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    job = ingest.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Unknown ingestion job: {job_id}")
+    return job
+
+@app.get("/index")
+async def get_index():
+    return ragqexec.index_state
+
+@app.post("/index/activate")
+async def activate_index(body: IndexActivateRequest):
+    try:
+        # Chroma I/O + the threading index lock: keep both off the event loop
+        return await run_in_threadpool(ragqexec.activate_collection, body.collection)
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=f"Cannot activate index: {str(e)}")
+
+@app.post("/index/rollback")
+async def rollback_index():
+    try:
+        return await run_in_threadpool(ragqexec.rollback_collection)
+    except Exception as e:
+        raise HTTPException(status_code=409, detail=f"Rollback failed: {str(e)}")
+
 @app.get("/ndrahackrx", response_class=HTMLResponse)
 async def ndra_dashboard():
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
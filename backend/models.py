@@ -16,3 +16,10 @@ class QueryResponse(BaseModel):
     matched_clause: str
     reason: str
     metadata: Optional[Dict[str, str]] = None
+
+
+class IndexActivateRequest(BaseModel):
+    collection: str
+
+    class Config:
+        extra = "forbid"
@@ -5,58 +5,160 @@
 
 from pypdf import PdfReader
 from docx import Document
+from concurrent.futures import ProcessPoolExecutor
+from bisect import bisect_right
 import glob
+import hashlib
 import os
 import pickle
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-def load_file(file_path: str) -> str:
+# === Parsed-Document Cache ===
+# Extracted text is cached per file (keyed by content hash + parser version) so
+# re-chunking with different parameters never re-parses the source documents.
+# Bump PARSER_VERSION whenever extraction logic changes to invalidate old entries.
+PARSER_VERSION = "1"
+PARSE_CACHE_DIR = os.getenv("NDRA_PARSE_CACHE_DIR", ".ndra_cache/parsed")
+PARALLEL_PAGE_THRESHOLD = int(os.getenv("NDRA_PARALLEL_PAGE_THRESHOLD", 32))
+PARSE_WORKERS = int(os.getenv("NDRA_PARSE_WORKERS", os.cpu_count() or 1))
+
+def file_hash(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _cache_path(digest: str) -> str:
+    return os.path.join(PARSE_CACHE_DIR, f"{digest}-v{PARSER_VERSION}.pkl")
+
+def _extract_pdf_range(args) -> list[str]:
+    # Runs in a worker process: each worker opens its own reader for its page range.
+    file_path, start, end = args
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+def _extract_pdf_pages(file_path: str, workers: int) -> list[str]:
+    reader = PdfReader(file_path)
+    n_pages = len(reader.pages)
+    if n_pages < PARALLEL_PAGE_THRESHOLD or workers <= 1:
+        return [page.extract_text() or "" for page in reader.pages]
+
+    step = -(-n_pages // workers)
+    ranges = [(file_path, start, min(start + step, n_pages)) for start in range(0, n_pages, step)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        parts = executor.map(_extract_pdf_range, ranges)
+    return [text for part in parts for text in part]
+
+def _parse_file(file_path: str, workers: int) -> list[dict]:
     ext = os.path.splitext(file_path)[1].lower()
     if ext == '.pdf':
-        reader = PdfReader(file_path)
-        return "\n".join([
-            page.extract_text() or "" for page in reader.pages
-        ])
+        return [
+            {"page": i + 1, "text": text}
+            for i, text in enumerate(_extract_pdf_pages(file_path, workers))
+        ]
 
     elif ext in ['.txt', '.md']:
         with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
+            return [{"page": 1, "text": f.read()}]
 
     elif ext == '.docx':
         doc = Document(file_path)
-        return "\n".join([para.text for para in doc.paragraphs])
+        return [
+            {"page": None, "paragraph": i + 1, "text": para.text}
+            for i, para in enumerate(doc.paragraphs)
+        ]
 
     else:
         raise ValueError(f"Unsupported file type: {ext}")
 
-def chunk_text(text: str, chunk_size=500, overlap=100):
-    splitter = RecursiveCharacterTextSplitter(
+def load_pages(file_path: str, use_cache: bool = True, workers: int = None) -> list[dict]:
+    """Return extracted text units ({"page", "text"}; DOCX adds "paragraph") for a file, using the parse cache.
+
+    workers caps page-level PDF extraction processes on a cache miss (default PARSE_WORKERS).
+    """
+    workers = PARSE_WORKERS if workers is None else workers
+    if not use_cache:
+        return _parse_file(file_path, workers)
+
+    cache_file = _cache_path(file_hash(file_path))
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            pass  # Corrupt/partial entry: fall through and re-parse
+
+    pages = _parse_file(file_path, workers)
+    os.makedirs(PARSE_CACHE_DIR, exist_ok=True)
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(pages, f)
+    os.replace(tmp_file, cache_file)
+    return pages
+
+def _join_units(pages: list[dict]) -> tuple[str, list[int]]:
+    # Same "\n".join layout load_file has always produced, plus each unit's start offset
+    starts, offset = [], 0
+    for unit in pages:
+        starts.append(offset)
+        offset += len(unit["text"]) + 1
+    return "\n".join(unit["text"] for unit in pages), starts
+
+def load_file(file_path: str) -> str:
+    return _join_units(load_pages(file_path))[0]
+
+def _splitter(chunk_size: int, overlap: int, **kwargs) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=overlap,
-        separators=["\n\n", "\n", ".", " "]
+        separators=["\n\n", "\n", ".", " "],
+        **kwargs
     )
-    return splitter.split_text(text)
+
+def chunk_text(text: str, chunk_size=500, overlap=100):
+    return _splitter(chunk_size, overlap).split_text(text)
+
+def chunk_pages(pages: list[dict], source: str, chunk_size=500, overlap=100) -> list[dict]:
+    """Chunk the joined document exactly like chunk_text(load_file(...)), tagging each chunk with the page/paragraph it starts in."""
+    text, starts = _join_units(pages)
+    chunks = []
+    # The splitter reports each chunk's real offset, so repeated boilerplate cannot be mis-located
+    for doc in _splitter(chunk_size, overlap, add_start_index=True).create_documents([text]):
+        position = max(0, doc.metadata.get("start_index", 0))
+        unit = pages[max(0, bisect_right(starts, position) - 1)] if pages else {}
+        meta = {"source": source, "page": unit.get("page")}
+        if "paragraph" in unit:
+            meta["paragraph"] = unit["paragraph"]
+        chunks.append({"text": doc.page_content, "metadata": meta})
+    return chunks
 
 if __name__ == "__main__":
     doc_dir = "doc/"
     pdf_files = glob.glob(os.path.join(doc_dir, "*.pdf"))
 
     all_chunks = []
+    all_metadata = []
 
     for file_path in pdf_files:
         print(f"📄 Loading: {file_path}")
-        raw_text = load_file(file_path)
-        chunks = chunk_text(raw_text)
-        all_chunks.extend(chunks)
+        pages = load_pages(file_path)
+        chunks = chunk_pages(pages, os.path.basename(file_path))
+        all_chunks.extend(c["text"] for c in chunks)
+        all_metadata.extend(c["metadata"] for c in chunks)
 
     # Preview first 5 chunks
     for i, chunk in enumerate(all_chunks[:5]):
-        print(f"Chunk {i+1}:\n{chunk}\n{'-'*80}")
+        print(f"Chunk {i+1} ({all_metadata[i]['source']} p.{all_metadata[i]['page']}):\n{chunk}\n{'-'*80}")
 
     print(f"Total Chunks: {len(all_chunks)}")
 
-    # Save all chunks to a pickle file
+    # Save all chunks to a pickle file (plain strings, as consumed by embeddings.py)
     with open("chunks.pkl", "wb") as f:
         pickle.dump(all_chunks, f)
 
-    print("✅ Saved chunks as chunks.pkl")
\ No newline at end of file
+    # Page-level provenance, aligned index-for-index with chunks.pkl
+    with open("chunks_meta.pkl", "wb") as f:
+        pickle.dump(all_metadata, f)
+
+    print("✅ Saved chunks as chunks.pkl (+ provenance in chunks_meta.pkl)")
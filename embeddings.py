@@ -4,27 +4,24 @@ import os
 import pickle
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
-from chromadb import HttpClient
 
 # ✅ Load environment variables
 load_dotenv()
 
-# ✅ Read .env values
-CHROMA_HOST = os.getenv("CHROMA_HOST")  # should be: ndra-production.up.railway.app
-CHROMA_PORT = int(os.getenv("CHROMA_PORT", 443))  # default 443 if missing
-CHROMA_SSL = os.getenv("CHROMA_SSL", "true").lower() == "true"
+# ✅ This script pushes to the hosted Chroma (e.g. ndra-production.up.railway.app), so keep its
+# historical 443/SSL defaults when only CHROMA_HOST is set. Must run before vectorstore reads them.
+os.environ.setdefault("CHROMA_PORT", "443")
+os.environ.setdefault("CHROMA_SSL", "true")
 
-if not CHROMA_HOST:
-    raise ValueError("CHROMA_HOST must be set")
+from vectorstore import CHROMA_MODE, CHROMA_PORT, CHROMA_SSL, EMBED_MODEL, get_client
 
-print(f"Connecting to: {CHROMA_HOST} {CHROMA_PORT} {CHROMA_SSL}")
+if CHROMA_MODE == "http" and not os.getenv("CHROMA_HOST"):
+    raise ValueError("CHROMA_HOST must be set (or use CHROMA_MODE=embedded)")
+if CHROMA_MODE == "http":
+    print(f"Pushing to Chroma port {CHROMA_PORT}, SSL={CHROMA_SSL} (set CHROMA_PORT / CHROMA_SSL to override)")
 
-# ✅ Connect to remote Chroma
-chroma_client = HttpClient(
-    host=CHROMA_HOST,
-    port=CHROMA_PORT,
-    ssl=CHROMA_SSL,
-)
+# ✅ Connect to Chroma (remote server or embedded chroma_db/, per CHROMA_MODE)
+chroma_client = get_client()
 
 # ✅ Create or get the collection
 collection = chroma_client.get_or_create_collection(name="ndr_chunks")
@@ -36,15 +33,22 @@ with open("chunks.pkl", "rb") as f:
 print(f"Loaded {len(chunks)} chunks.")
 
 # ✅ Generate embeddings
-model = SentenceTransformer("all-MiniLM-L6-v2")
+model = SentenceTransformer(EMBED_MODEL)
 embeddings = model.encode(chunks, show_progress_bar=True)
 embeddings = embeddings.tolist() if hasattr(embeddings, "tolist") else embeddings
 
 print(f"Generated {len(embeddings)} embeddings.")
 
-# ✅ Create IDs and metadata
+# ✅ Create IDs and metadata (page-level provenance from chunks_meta.pkl when available)
 ids = [f"chunk-{i}" for i in range(len(chunks))]
-metadatas = [{"source": "NDRA_docs"} for _ in chunks]
+if os.path.exists("chunks_meta.pkl"):
+    with open("chunks_meta.pkl", "rb") as f:
+        metadatas = [
+            {k: v for k, v in meta.items() if v is not None}
+            for meta in pickle.load(f)
+        ]
+else:
+    metadatas = [{"source": "NDRA_docs"} for _ in chunks]
 
 # ✅ Add to Chroma
 collection.add(
@@ -54,5 +58,5 @@ collection.add(
     metadatas=metadatas
 )
 
-print("✅ Successfully pushed chunks to ChromaDB remote server.")
+print(f"✅ Successfully pushed chunks to ChromaDB ({CHROMA_MODE}).")
 print("Total chunks in collection:", collection.count())
\ No newline at end of file
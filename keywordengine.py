@@ -0,0 +1,176 @@
+# keywordengine.py
+# NDRA | Single-pass keyword matching for intent, domain & entity rules
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+# === Keyword Tables (order = priority: first listed wins) ===
+INTENT_KEYWORDS = {
+    "eligibility_check": ["eligible", "eligibility", "can i", "still covered"],
+    "claim_status": ["claim status", "track claim", "claim update"],
+    "coverage_check": ["covered", "coverage", "what is included"],
+    "renewal": ["renew", "extension", "renewal"],
+    "premium_info": ["premium", "cost", "price", "installment"],
+    "document_requirement": ["documents", "papers", "required for"],
+}
+
+DOMAIN_KEYWORDS = {
+    "health": [
+        "health", "hospital", "surgery", "treatment", "medical", "doctor", "illness",
+        "pre-existing", "bypass", "angioplasty", "diabetes", "critical illness", "procedure"
+    ],
+    "motor": [
+        "motor", "car", "bike", "vehicle", "accident", "third-party", "own damage",
+        "garage", "repair", "engine", "theft", "four-wheeler", "two-wheeler"
+    ],
+    "travel": [
+        "travel", "trip", "visa", "flight", "journey", "international", "abroad", "foreign",
+        "luggage", "delay", "passport", "missed flight"
+    ],
+    "life": [
+        "life insurance", "death", "term plan", "nominee", "sum assured", "life cover",
+        "maturity", "premium waiver", "term policy"
+    ],
+    "property": [
+        "property", "fire", "theft", "flood", "earthquake", "natural disaster", "building",
+        "home", "house", "damage", "structure"
+    ]
+}
+
+# field -> {value: keywords}
+ENTITY_KEYWORDS = {
+    "incident": {
+        "accident": ["accident"],
+        "surgery": ["surgery"],
+    },
+    "policy_status": {
+        "new": ["new policy"],
+        "existing": ["old policy", "existing policy"],
+    },
+}
+
+TIME_PATTERN = re.compile(r"(last month|[0-9]+\s+(days?|months?|years?)\s+ago)")
+
+# === Matcher Construction (runs once at import) ===
+def _build_trie(keywords) -> dict:
+    root = {}
+    for kw in keywords:
+        node = root
+        for ch in kw:
+            node = node.setdefault(ch, {})
+        node[""] = True
+    return root
+
+def _trie_regex(node: dict) -> str:
+    # Shared prefixes are factored out so each position is tested in one branch walk;
+    # a terminal with children becomes an optional (greedy) suffix => longest match wins.
+    alts = [re.escape(ch) + _trie_regex(child) for ch, child in sorted(node.items()) if ch]
+    if not alts:
+        return ""
+    body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+    if "" in node:
+        body = f"(?:{body})?"
+    return body
+
+def _build_tags() -> Dict[str, List[Tuple[str, str, int]]]:
+    tags = {}
+    for rank, (intent, keywords) in enumerate(INTENT_KEYWORDS.items()):
+        for kw in keywords:
+            tags.setdefault(kw, []).append(("intent", intent, rank))
+    for rank, (domain, keywords) in enumerate(DOMAIN_KEYWORDS.items()):
+        for kw in keywords:
+            tags.setdefault(kw, []).append(("domain", domain, rank))
+    for field, values in ENTITY_KEYWORDS.items():
+        for rank, (value, keywords) in enumerate(values.items()):
+            for kw in keywords:
+                tags.setdefault(kw, []).append((field, value, rank))
+    return tags
+
+KEYWORD_TAGS = _build_tags()
+# The lookahead reports the longest keyword starting at each position; every
+# shorter keyword that is a prefix of it also matches there, so expand to those.
+_PREFIXES = {
+    kw: [other for other in KEYWORD_TAGS if kw.startswith(other)]
+    for kw in KEYWORD_TAGS
+}
+MATCHER = re.compile(f"(?=({_trie_regex(_build_trie(KEYWORD_TAGS))}))")
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+# === Scanning ===
+def scan(text: str) -> List[Tuple[str, int, int, bool]]:
+    """Return (keyword, start, end, word_bounded) for every keyword occurrence in lowercased text."""
+    hits = []
+    n = len(text)
+    for m in MATCHER.finditer(text):
+        start = m.start()
+        left_ok = start == 0 or not _is_word(text[start - 1])
+        for kw in _PREFIXES[m.group(1)]:
+            end = start + len(kw)
+            bounded = left_ok and (end == n or not _is_word(text[end]))
+            hits.append((kw, start, end, bounded))
+    return hits
+
+def _best(hits, kind: str, lo: int = 0, hi: Optional[int] = None, bounded: bool = False) -> Optional[str]:
+    best_rank, best_label = None, None
+    for kw, start, end, is_bounded in hits:
+        if start < lo or (hi is not None and end > hi) or (bounded and not is_bounded):
+            continue
+        for tag_kind, label, rank in KEYWORD_TAGS[kw]:
+            if tag_kind == kind and (best_rank is None or rank < best_rank):
+                best_rank, best_label = rank, label
+    return best_label
+
+def _entities(hits, query_lower: str, hi: int) -> dict:
+    entities = {}
+    incident = _best(hits, "incident", 0, hi)
+    if incident:
+        entities["incident"] = incident
+    time_match = TIME_PATTERN.search(query_lower)
+    if time_match:
+        entities["incident_time"] = time_match.group(1)
+    policy_status = _best(hits, "policy_status", 0, hi)
+    if policy_status:
+        entities["policy_status"] = policy_status
+    return entities
+
+# === Public API ===
+def match_intent(query: str) -> str:
+    return _best(scan(query.lower()), "intent") or "general_inquiry"
+
+def match_entities(query: str) -> dict:
+    query_lower = query.lower()
+    return _entities(scan(query_lower), query_lower, len(query_lower))
+
+def match_domain(info: Dict, query: str) -> str:
+    return tag_query(query, info)["domain"]
+
+def tag_query(query: str, info: Optional[Dict] = None) -> dict:
+    """Tag intent, domain and entities from a single scan over query + extracted info."""
+    info = info or {}
+    query_lower = query.lower()
+    subject_text = (info.get("subject") or "").lower()
+    # Same text detect_domain has always matched on; subject sits at a known offset,
+    # so the "subject first" pass is just a span filter over the one scan.
+    full_text = f"{query_lower} {subject_text} {str(info).lower()}"
+    hits = scan(full_text)
+
+    q_end = len(query_lower)
+    s_start = q_end + 1
+    s_end = s_start + len(subject_text)
+    domain = (
+        _best(hits, "domain", s_start, s_end, bounded=True)
+        or _best(hits, "domain", bounded=True)
+        or "general"
+    )
+    return {
+        "intent": _best(hits, "intent", 0, q_end) or "general_inquiry",
+        "domain": domain,
+        "entities": _entities(hits, query_lower, q_end),
+    }
+
+def tag_queries(queries: List[str], infos: Optional[List[Dict]] = None) -> List[dict]:
+    """Batch version of tag_query; infos (if given) is aligned with queries."""
+    infos = infos or [None] * len(queries)
+    return [tag_query(q, info) for q, info in zip(queries, infos)]
@@ -0,0 +1,118 @@
+# kwbench.py
+# NDRA | Micro-benchmark: keywordengine single-pass matcher vs. the original per-keyword scans
+#
+# Usage: python kwbench.py [n_queries]
+# The legacy functions below are verbatim copies of the pre-keywordengine
+# classify_intent / extract_structured_entities / detect_domain so both paths
+# can be timed (and cross-checked) without importing the LLM-backed modules.
+
+import re
+import sys
+import time
+import random
+from keywordengine import (
+    INTENT_KEYWORDS, DOMAIN_KEYWORDS,
+    match_intent, match_entities, match_domain, tag_queries,
+)
+
+# === Legacy implementations (baseline) ===
+def legacy_classify_intent(query: str) -> str:
+    query_lower = query.lower()
+    for intent, keywords in INTENT_KEYWORDS.items():
+        if any(kw in query_lower for kw in keywords):
+            return intent
+    return "general_inquiry"
+
+def legacy_extract_structured_entities(query: str) -> dict:
+    entities = {}
+
+    if "accident" in query.lower():
+        entities["incident"] = "accident"
+    elif "surgery" in query.lower():
+        entities["incident"] = "surgery"
+
+    time_match = re.search(r"(last month|[0-9]+\s+(days?|months?|years?)\s+ago)", query.lower())
+    if time_match:
+        entities["incident_time"] = time_match.group(1)
+
+    if "new policy" in query.lower():
+        entities["policy_status"] = "new"
+    elif "old policy" in query.lower() or "existing policy" in query.lower():
+        entities["policy_status"] = "existing"
+
+    return entities
+
+def legacy_detect_domain(info: dict, query: str) -> str:
+    subject_text = (info.get("subject") or "").lower()
+    full_text = f"{query} {subject_text} {str(info)}".lower()
+
+    for domain, keywords in DOMAIN_KEYWORDS.items():
+        if any(re.search(rf'\b{re.escape(kw)}\b', subject_text) for kw in keywords):
+            return domain
+
+    for domain, keywords in DOMAIN_KEYWORDS.items():
+        if any(re.search(rf'\b{re.escape(kw)}\b', full_text) for kw in keywords):
+            return domain
+
+    return "general"
+
+# === Synthetic workload ===
+SAMPLE_QUERIES = [
+    ("46-year-old male, knee surgery in Pune, 3-month-old policy", {"subject": "knee surgery", "age": 46}),
+    ("Can I claim for my car accident 2 days ago on a new policy?", {"subject": "car accident"}),
+    ("Is my dad still covered for bypass surgery under his existing policy?", {"subject": "eligibility"}),
+    ("What documents are required for a missed flight claim abroad?", {"subject": "missed flight"}),
+    ("How do I renew my term plan and update the nominee?", {"subject": "term plan renewal"}),
+    ("Track claim for flood damage to my house last month", {"subject": "flood damage"}),
+    ("What is the premium waiver rule on my life insurance?", {"subject": None}),
+    ("Does this policy cover brain surgery, and what are the conditions?", {}),
+]
+
+FILLER = ["please", "help", "urgent", "my", "policy", "thanks", "regarding", "insurance"]
+
+def make_workload(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    workload = []
+    for _ in range(n):
+        query, info = rng.choice(SAMPLE_QUERIES)
+        noise = " ".join(rng.choice(FILLER) for _ in range(rng.randint(0, 12)))
+        workload.append((f"{noise} {query}".strip(), info))
+    return workload
+
+def _time(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    workload = make_workload(n)
+    queries = [q for q, _ in workload]
+    infos = [info for _, info in workload]
+
+    # Cross-check before timing: the engine must agree with the legacy rules.
+    mismatches = 0
+    for q, info in workload:
+        if (legacy_classify_intent(q) != match_intent(q)
+                or legacy_extract_structured_entities(q) != match_entities(q)
+                or legacy_detect_domain(info, q) != match_domain(info, q)):
+            mismatches += 1
+    print(f"🔍 Checked {n} queries, mismatches: {mismatches}")
+
+    def legacy():
+        for q, info in workload:
+            legacy_classify_intent(q)
+            legacy_extract_structured_entities(q)
+            legacy_detect_domain(info, q)
+
+    def engine():
+        tag_queries(queries, infos)
+
+    t_legacy = _time(legacy)
+    t_engine = _time(engine)
+    print(f"🐢 Legacy (3 functions):   {t_legacy:.4f}s  ({t_legacy / n * 1e6:.1f} µs/query)")
+    print(f"⚡ keywordengine (1 pass): {t_engine:.4f}s  ({t_engine / n * 1e6:.1f} µs/query)")
+    print(f"📊 Speedup: {t_legacy / t_engine:.2f}x")
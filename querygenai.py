@@ -4,6 +4,7 @@ import json
 from typing import Dict
 from dotenv import load_dotenv
 from fastllm import fast_chat  # ✅ Make sure fastllm.py is created as discussed
+from keywordengine import match_domain
 
 # === Load environment ===
 load_dotenv()
@@ -48,41 +49,8 @@ def extract_query_info_llm(query: str) -> Dict:
 
 # === Domain Detection ===
 def detect_domain(info: Dict, query: str) -> str:
-    subject_text = (info.get("subject") or "").lower()
-    full_text = f"{query} {subject_text} {str(info)}".lower()
-
-    domain_keywords = {
-        "health": [
-            "health", "hospital", "surgery", "treatment", "medical", "doctor", "illness",
-            "pre-existing", "bypass", "angioplasty", "diabetes", "critical illness", "procedure"
-        ],
-        "motor": [
-            "motor", "car", "bike", "vehicle", "accident", "third-party", "own damage",
-            "garage", "repair", "engine", "theft", "four-wheeler", "two-wheeler"
-        ],
-        "travel": [
-            "travel", "trip", "visa", "flight", "journey", "international", "abroad", "foreign",
-            "luggage", "delay", "passport", "missed flight"
-        ],
-        "life": [
-            "life insurance", "death", "term plan", "nominee", "sum assured", "life cover",
-            "maturity", "premium waiver", "term policy"
-        ],
-        "property": [
-            "property", "fire", "theft", "flood", "earthquake", "natural disaster", "building",
-            "home", "house", "damage", "structure"
-        ]
-    }
-
-    for domain, keywords in domain_keywords.items():
-        if any(re.search(rf'\b{re.escape(kw)}\b', subject_text) for kw in keywords):
-            return domain
-
-    for domain, keywords in domain_keywords.items():
-        if any(re.search(rf'\b{re.escape(kw)}\b', full_text) for kw in keywords):
-            return domain
-
-    return "general"
+    # Single precompiled pass over query + subject (see keywordengine.py)
+    return match_domain(info, query)
 
 # === Domain-specific coverage hints ===
 def get_coverage_hints(domain: str) -> str:
@@ -97,11 +65,12 @@ def get_coverage_hints(domain: str) -> str:
     return hints.get(domain, hints["general"])
 
 # === Rewrite query based on info ===
-def rewrite_query(info: Dict, query: str) -> str:
+def rewrite_query(info: Dict, query: str, domain: str = None) -> str:
     if "error" in info:
         return "Unable to process query."
 
-    domain = detect_domain(info, query)
+    # Callers that already ran tag_query pass its domain to avoid a second scan
+    domain = domain or detect_domain(info, query)
     coverage_points = get_coverage_hints(domain)
 
     subject = (info.get("subject") or "").lower()
@@ -4,17 +4,18 @@
 import os
 import time
 import re
-import chromadb
-from chromadb import HttpClient
+import json
+import threading
 from dotenv import load_dotenv
 from pprint import pprint
 from difflib import SequenceMatcher
 from concurrent.futures import ThreadPoolExecutor
-from querygenai import extract_query_info_llm, rewrite_query
+from querygenai import extract_query_info_llm, rewrite_query, safe_json_parse
 from strqgen import build_structured_query, compute_completeness_score
+from keywordengine import tag_query
+from vectorstore import embed_query, get_client, open_serving_collection
 import google.generativeai as genai
 from fastllm import fast_chat  # ✅ Fast Local/API LLM
-from langchain.embeddings import OpenAIEmbeddings
 
 
 # --- Load Environment Variables ---
@@ -25,24 +26,98 @@ genai_key = os.getenv("GOOGLE_API_KEY")
 if genai_key:
     genai.configure(api_key=genai_key)
 
-# --- Embedding Setup ---
-embed_func = OpenAIEmbeddings(
-    model="text-embedding-3-small",  # must be a model available in OpenRouter
-    openai_api_key=os.getenv("OPENAI_API_KEY"),
-    openai_api_base=os.getenv("OPENAI_API_BASE")
-)
+# Single-call mode: one LLM round trip returns extraction + answer as JSON
+SINGLE_CALL_MODE = os.getenv("NDRA_SINGLE_CALL", "false").lower() == "true"
+SINGLE_CALL_RETRIEVAL = os.getenv("NDRA_SINGLE_CALL_RETRIEVAL", "rewrite")  # "rewrite" | "raw"
 
-# Load from environment
-CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
-CHROMA_PORT = int(os.getenv("CHROMA_PORT", 8000))
-CHROMA_SSL = os.getenv("CHROMA_SSL", "False").lower() == "true"
+# Connect to ChromaDB (embedded or remote, per CHROMA_MODE — see vectorstore.py)
+chroma_client = get_client()
 
-print("Connecting to:", CHROMA_HOST, CHROMA_PORT, CHROMA_SSL)
+# --- Active Index Pointer (blue/green) ---
+# Queries always read the collection named in the pointer; ingestion builds a new
+# versioned collection and swaps the pointer only once it is complete.
+INDEX_STATE_PATH = os.getenv("NDRA_INDEX_STATE", ".ndra_cache/index_state.json")
+INDEX_HISTORY_LIMIT = 5  # older indexes are deleted once they fall out of the history
+INDEX_RETIRE_GRACE_S = float(os.getenv("NDRA_INDEX_RETIRE_GRACE_S", 60))
+_index_lock = threading.Lock()
 
-# Connect to ChromaDB
-chroma_client = HttpClient(host=CHROMA_HOST, port=CHROMA_PORT, ssl=CHROMA_SSL)
-collection = chroma_client.get_or_create_collection(name="ndr_chunks")
-print("Chroma Collection Count:", collection.count())
+def _load_index_state() -> dict:
+    try:
+        with open(INDEX_STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"active": "ndr_chunks", "history": []}
+
+def _save_index_state(state: dict):
+    os.makedirs(os.path.dirname(INDEX_STATE_PATH) or ".", exist_ok=True)
+    tmp_path = f"{INDEX_STATE_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, INDEX_STATE_PATH)
+
+index_state = _load_index_state()
+collection = open_serving_collection(chroma_client, index_state["active"])
+print("Chroma Collection:", index_state["active"], "Count:", collection.count())
+
+def _swap_collection(name: str, new_collection, history: list) -> tuple:
+    # Caller holds _index_lock (in-memory work + a small file write only, no Chroma I/O).
+    # Returns (new state, collections no longer referenced).
+    global collection, index_state
+    state = {"active": name, "history": history[:INDEX_HISTORY_LIMIT]}
+    referenced = {name, *state["history"]}
+    retired = [c for c in [index_state["active"], *index_state["history"]] if c not in referenced]
+    _save_index_state(state)
+    collection, index_state = new_collection, state  # in-flight queries keep the old handle
+    return state, retired
+
+def _retire_collections(names: list):
+    # Dropped after a grace period so queries still holding an old handle can finish
+    def drop():
+        for name in names:
+            try:
+                chroma_client.delete_collection(name=name)
+                print("🗑️ Deleted retired index:", name)
+            except Exception as e:
+                print(f"⚠️ Could not delete retired index {name}: {e}")
+    if names:
+        timer = threading.Timer(INDEX_RETIRE_GRACE_S, drop)
+        timer.daemon = True
+        timer.start()
+
+def active_collection() -> tuple:
+    """Consistent (name, handle) snapshot of the active index."""
+    with _index_lock:
+        return index_state["active"], collection
+
+def activate_collection(name: str, expected_active: str = None) -> dict:
+    """Point queries at `name`. With expected_active, refuse if the active index has changed since then."""
+    new_collection = chroma_client.get_collection(name=name)  # raises if it does not exist; outside the lock
+    with _index_lock:
+        previous = index_state["active"]
+        if expected_active is not None and previous != expected_active:
+            raise RuntimeError(
+                f"Active index changed from '{expected_active}' to '{previous}' during the build; not activating '{name}'"
+            )
+        if previous == name:
+            return index_state
+        history = [previous] + [h for h in index_state["history"] if h not in (previous, name)]
+        state, retired = _swap_collection(name, new_collection, history)
+    _retire_collections(retired)
+    return state
+
+def rollback_collection() -> dict:
+    """Re-activate the previous index; the one rolled back from is retired."""
+    with _index_lock:
+        history = list(index_state["history"])
+    if not history:
+        raise ValueError("No previous index to roll back to")
+    new_collection = chroma_client.get_collection(name=history[0])  # outside the lock
+    with _index_lock:
+        if index_state["history"] != history:
+            raise RuntimeError("Index changed during rollback; retry")
+        state, retired = _swap_collection(history[0], new_collection, history[1:])
+    _retire_collections(retired)
+    return state
 
 # --- Wrap LLM Response into JSON Format ---
 def wrap_llm_response_to_json(llm_output: str) -> dict:
@@ -90,7 +165,7 @@ def trace_supporting_clauses(justification: str, clauses: list[str], top_k: int
 
 # --- Semantic Search with Trim in Parallel ---
 def semantic_search_parallel(query: str, top_k=5):
-    query_vec = embed_func(query)
+    query_vec = embed_query(query)  # same model as the indexed chunks (vectorstore.EMBED_MODEL)
     results = collection.query(query_embeddings=[query_vec], n_results=top_k)
     raw_chunks = results["documents"][0]
     metadatas = results["metadatas"][0]
@@ -134,6 +209,78 @@ Answer clearly:
 3. Final conclusion
 """.strip()
 
+# --- Single-Call Prompt Builder (extraction + answer in one JSON) ---
+EXTRACTED_FIELDS = ["age", "gender", "procedure", "location", "policy_duration", "subject"]
+
+def single_call_prompt(user_query: str, clauses: list[str]) -> str:
+    return f"""
+You are an Advanced Policy Document Assistant.
+
+A user asked: "{user_query}"
+
+Relevant clauses (numbered):
+{chr(10).join(f"[{i}] {clause.strip()}" for i, clause in enumerate(clauses, 1))}
+
+Tasks:
+1. Extract from the user query: {", ".join(EXTRACTED_FIELDS)}. Use null for anything missing.
+2. Decide whether the query is answered YES or NO by the clauses.
+   If the clauses mention surgeries in general (e.g., "in-patient surgeries", "orthopedic procedures"), and the user procedure fits within that category, consider it as covered unless excluded.
+   If multiple clauses apply, combine reasoning. If unsure, explain what's missing in the justification.
+3. Cite the clause numbers your justification relies on.
+
+Return ONLY a JSON object, no markdown, no explanation, exactly in this shape:
+{{"extracted": {{"age": null, "gender": null, "procedure": null, "location": null, "policy_duration": null, "subject": null}},
+ "answer": "Yes" or "No",
+ "justification": "explanation referencing the clauses and a final conclusion",
+ "cited_clauses": [1, 2]}}
+""".strip()
+
+def json_repair_prompt(bad_output: str, error: str, n_clauses: int) -> str:
+    return f"""
+Your previous reply could not be used: {error}
+
+Previous reply:
+{bad_output}
+
+Rewrite it as ONLY a JSON object, no markdown, no explanation, exactly in this shape:
+{{"extracted": {{"age": null, "gender": null, "procedure": null, "location": null, "policy_duration": null, "subject": null}},
+ "answer": "Yes" or "No",
+ "justification": "explanation referencing the clauses and a final conclusion",
+ "cited_clauses": [clause numbers between 1 and {n_clauses}]}}
+""".strip()
+
+def validate_single_call_output(data: dict, n_clauses: int) -> dict:
+    if not isinstance(data, dict) or "error" in data:
+        raise ValueError(f"LLM did not return a JSON object: {data}")
+
+    answer = str(data.get("answer", "")).strip().capitalize()
+    if answer not in ("Yes", "No"):
+        raise ValueError(f"Invalid 'answer': {data.get('answer')!r}")
+
+    justification = data.get("justification")
+    if not isinstance(justification, str) or not justification.strip():
+        raise ValueError("Missing 'justification'")
+
+    cited = data.get("cited_clauses") or []
+    if not isinstance(cited, list):
+        raise ValueError(f"Invalid 'cited_clauses': {cited!r}")
+    try:
+        cited = [int(i) for i in cited]
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid 'cited_clauses': {cited!r}")
+    cited = [i for i in dict.fromkeys(cited) if 1 <= i <= n_clauses]
+
+    extracted = data.get("extracted") or {}
+    if not isinstance(extracted, dict):
+        raise ValueError(f"Invalid 'extracted': {extracted!r}")
+
+    return {
+        "extracted": {field: extracted.get(field) for field in EXTRACTED_FIELDS},
+        "answer": answer,
+        "justification": justification.strip(),
+        "cited_clauses": cited,
+    }
+
 # --- Main LLM Inference Handler ---
 def generate_llm_response(prompt: str) -> str:
     try:
@@ -165,14 +312,89 @@ def generate_llm_response(prompt: str) -> str:
         except Exception as gemini_error:
             raise RuntimeError(f"❌ Both LLMs failed. Gemini error: {str(gemini_error)}")
 
+# --- Single-Call Pipeline ---
+def run_single_call_pipeline(user_query: str):
+    overall_start = time.time()
+
+    # Rule-only rewrite (no LLM) for retrieval, or the raw query
+    if SINGLE_CALL_RETRIEVAL == "raw":
+        retrieval_query = user_query
+    else:
+        retrieval_query = rewrite_query({}, user_query)
+
+    # Semantic search
+    search_start = time.time()
+    top_chunks, metadata = semantic_search_parallel(retrieval_query)
+    search_end = time.time()
+
+    # One LLM call: extraction + answer + citations
+    llm_start = time.time()
+    llm_response = generate_llm_response(single_call_prompt(user_query, top_chunks))
+    llm_end = time.time()
+
+    try:
+        parsed = validate_single_call_output(safe_json_parse(llm_response), len(top_chunks))
+    except ValueError as first_error:
+        # One repair attempt on the same clauses; never re-run retrieval or the regex scrape
+        print(f"⚠️ Single-call output failed validation, retrying with repair prompt: {first_error}")
+        llm_start_retry = time.time()
+        llm_response = generate_llm_response(json_repair_prompt(llm_response, str(first_error), len(top_chunks)))
+        llm_end += time.time() - llm_start_retry
+        try:
+            parsed = validate_single_call_output(safe_json_parse(llm_response), len(top_chunks))
+        except ValueError as e:
+            print(f"⚠️ Repaired output still invalid, answering Unknown: {e}")
+            parsed = {
+                "extracted": {field: None for field in EXTRACTED_FIELDS},
+                "answer": "Unknown",
+                "justification": f"The model did not return a valid structured answer: {e}",
+                "cited_clauses": [],
+            }
+
+    info = parsed["extracted"]
+    tags = tag_query(user_query, info)
+    supporting = [top_chunks[i - 1] for i in parsed["cited_clauses"]]
+    if not supporting and parsed["answer"] != "Unknown":
+        supporting = trace_supporting_clauses(parsed["justification"], top_chunks)
+
+    overall_end = time.time()
+
+    return {
+        "query": user_query,
+        "rewritten_query": retrieval_query,
+        "intent": tags["intent"],
+        "extracted": info,
+        "matched_clauses": top_chunks,
+        "answer_structured": {
+            "answer": parsed["answer"],
+            "justification": parsed["justification"],
+            "cited_clauses": parsed["cited_clauses"],
+            "supporting_clauses": supporting,
+        },
+        "raw_answer": llm_response,
+        "metadata": metadata,
+        "mode": "single_call",
+        "timing": {
+            "semantic_search": round(search_end - search_start, 4),
+            "llm_inference": round(llm_end - llm_start, 4),
+            "total": round(overall_end - overall_start, 4)
+        }
+    }
+
 # --- Full Pipeline ---
-def run_rag_pipeline(user_query: str):
+def run_rag_pipeline(user_query: str, single_call: bool = None):
+    if single_call is None:
+        single_call = SINGLE_CALL_MODE
+    if single_call:
+        return run_single_call_pipeline(user_query)
+
     overall_start = time.time()
 
     # Extract and transform query
     info = extract_query_info_llm(user_query)
-    rewritten = rewrite_query(info, user_query)
-    structured = build_structured_query(info, rewritten, user_query)
+    tags = tag_query(user_query, info)  # one keyword pass feeds both the rewrite and the structuring
+    rewritten = rewrite_query(info, user_query, domain=tags["domain"])
+    structured = build_structured_query(info, rewritten, user_query, tags=tags)
     completeness = compute_completeness_score(structured)
 
     # Semantic search
@@ -200,6 +422,7 @@ def run_rag_pipeline(user_query: str):
         "answer_structured": answer_data,
         "raw_answer": llm_response,
         "metadata": metadata,
+        "mode": "two_call",
         "timing": {
             "semantic_search": round(search_end - search_start, 4),
             "llm_inference": round(llm_end - llm_start, 4),
@@ -221,7 +444,8 @@ def run_pipeline(query: str, metadata: dict = None) -> QueryResponse:
         return QueryResponse(
             question=result["query"],
             structured_query={
-                "intent": result["intent"]
+                "intent": result["intent"],
+                **(result.get("extracted") or {})
             },
             final_answer=result["answer_structured"]["answer"],
             matched_clause="\n\n".join(result["answer_structured"]["supporting_clauses"]),
@@ -229,6 +453,7 @@ def run_pipeline(query: str, metadata: dict = None) -> QueryResponse:
             metadata={
                 "raw_answer": result["raw_answer"],
                 "timing": str(result["timing"]),
+                "mode": result["mode"],
                 "doc_title": metadata.get("doc_title") if metadata else "Unknown"
             }
         )
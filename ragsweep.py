@@ -0,0 +1,302 @@
+# ragsweep.py
+# NDRA | Offline retrieval parameter sweep: chunk_size / overlap / trim / top_k -> recall@k, MRR, tokens, search latency
+#
+# Usage:
+#   python ragsweep.py labels.jsonl --docs doc/ \
+#       --chunk-sizes 300,500,800 --overlaps 50,100 --trims 200,400,0 --top-ks 3,5,8 \
+#       [--min-recall 0.8] [--out sweep.csv]
+#
+# labels.jsonl: one {"question": "...", "clauses": ["relevant clause text", ...]} per line
+# (a JSON list of the same objects also works). trim=0 means "no trim".
+#
+# Parsed text comes from the chunks.py parse cache and chunk embeddings are cached on
+# disk by (model, text), so only configurations producing new chunk texts cost anything.
+# Questions and chunks are both embedded with vectorstore.EMBED_MODEL, exactly as the
+# server does (ragqexec embeds queries via vectorstore.embed_query), so rankings describe
+# the production retrieval setup. Retrieval runs as real top-k queries against an
+# in-memory embedded Chroma collection built per chunking config, so rankings and
+# search latency come from the HNSW index.
+# The recommended config is the one with the smallest prompt among those meeting the
+# recall bar: prompt size drives LLM latency far more than vector search does.
+
+import argparse
+import csv
+import glob
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import time
+from difflib import SequenceMatcher
+
+import numpy as np
+import tiktoken
+from sentence_transformers import SentenceTransformer
+
+from chunks import load_pages, chunk_pages
+from vectorstore import EMBED_MODEL, make_client
+
+EMBED_CACHE_DIR = os.getenv("NDRA_EMBED_CACHE_DIR", ".ndra_cache/embeddings")
+MATCH_THRESHOLD = 0.5  # share of the shorter text that must overlap to count as the labelled clause
+ADD_BATCH = 1000
+
+
+# === Embedding Cache ===
+class EmbeddingCache:
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.path = os.path.join(EMBED_CACHE_DIR, f"{model_name.replace('/', '_')}.pkl")
+        self._model = None
+        self._vectors = {}
+        self._dirty = False
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                self._vectors = pickle.load(f)
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        keys = [self._key(t) for t in texts]
+        missing = list({k: t for k, t in zip(keys, texts) if k not in self._vectors}.items())
+        if missing:
+            if self._model is None:
+                self._model = SentenceTransformer(self.model_name)
+            vectors = self._model.encode([t for _, t in missing], show_progress_bar=len(missing) > 256)
+            for (k, _), vec in zip(missing, vectors):
+                self._vectors[k] = np.asarray(vec, dtype=np.float32)
+            self._dirty = True
+        return np.stack([self._vectors[k] for k in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+
+    def save(self):
+        if not self._dirty:
+            return
+        os.makedirs(EMBED_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self._vectors, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+
+# === Helpers ===
+def load_labels(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        labels = json.loads(text)
+    else:
+        labels = [json.loads(line) for line in text.splitlines() if line.strip()]
+    for item in labels:
+        if not item.get("question") or not item.get("clauses"):
+            raise ValueError(f"Label needs 'question' and non-empty 'clauses': {item}")
+    return labels
+
+
+def normalise(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def trim_chunk(chunk: str, trim: int) -> str:
+    # Same cleanup semantic_search_parallel applies before prompting
+    cleaned = " ".join(chunk.strip().split())
+    return cleaned[:trim] if trim else cleaned
+
+
+def clause_span_end(chunk: str, clause: str):
+    """End offset (in the cleaned, untrimmed chunk) of the span matching the clause, or None if not relevant.
+
+    Relevance is decided once on the full chunk, with a bar that does not depend on trim;
+    a trimmed chunk then only counts if the matched span still fits inside the trim.
+    """
+    a, b = normalise(chunk), normalise(clause)
+    if not a or not b:
+        return None
+    if b in a:
+        return a.find(b) + len(b)
+    if a in b:
+        return len(a)
+    match = SequenceMatcher(None, a, b, autojunk=False).find_longest_match(0, len(a), 0, len(b))
+    if match.size >= MATCH_THRESHOLD * min(len(a), len(b)):
+        return match.a + match.size
+    return None
+
+
+def normalise_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def pareto_front(rows: list[dict]) -> None:
+    # Maximise recall & MRR, minimise prompt tokens & latency
+    def dominates(a, b):
+        better_or_equal = (a["recall"] >= b["recall"] and a["mrr"] >= b["mrr"]
+                           and a["prompt_tokens"] <= b["prompt_tokens"] and a["latency_ms"] <= b["latency_ms"])
+        strictly = (a["recall"] > b["recall"] or a["mrr"] > b["mrr"]
+                    or a["prompt_tokens"] < b["prompt_tokens"] or a["latency_ms"] < b["latency_ms"])
+        return better_or_equal and strictly
+
+    for row in rows:
+        row["pareto"] = not any(dominates(other, row) for other in rows if other is not row)
+
+
+# === Sweep ===
+def build_collection(client, name: str, vectors: np.ndarray):
+    try:
+        client.delete_collection(name=name)
+    except Exception:
+        pass
+    collection = client.create_collection(name=name, metadata={"hnsw:space": "cosine"})
+    for start in range(0, len(vectors), ADD_BATCH):
+        batch = vectors[start:start + ADD_BATCH]
+        collection.add(ids=[str(start + i) for i in range(len(batch))], embeddings=batch.tolist())
+    return collection
+
+
+def time_search(collection, q_vecs: np.ndarray, k: int, repeats: int) -> float:
+    """Mean over questions of the median single-query latency (ms) at n_results=k."""
+    per_question = []
+    for q_vec in q_vecs.tolist():
+        runs = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            collection.query(query_embeddings=[q_vec], n_results=k)
+            runs.append((time.perf_counter() - start) * 1000)
+        per_question.append(float(np.median(runs)))
+    return float(np.mean(per_question))
+
+
+def sweep(labels, doc_paths, chunk_sizes, overlaps, trims, top_ks, repeats: int = 5) -> list[dict]:
+    cache = EmbeddingCache(EMBED_MODEL)
+    encoder = tiktoken.get_encoding("cl100k_base")
+    client = make_client("ephemeral")
+    pages = {path: load_pages(path) for path in doc_paths}  # parse cache: no re-parsing per config
+
+    questions = [item["question"] for item in labels]
+    q_vecs = normalise_rows(cache.encode(questions))
+    max_k = max(top_ks)
+    rows = []
+
+    for chunk_size, overlap in itertools.product(chunk_sizes, overlaps):
+        if overlap >= chunk_size:
+            continue
+        texts = [
+            c["text"]
+            for path, units in pages.items()
+            for c in chunk_pages(units, os.path.basename(path), chunk_size, overlap)
+        ]
+        if not texts:
+            continue
+        c_vecs = normalise_rows(cache.encode(texts))
+        cache.save()
+        k_eff = min(max_k, len(texts))
+
+        # Real top-k queries against this config's index
+        name = f"sweep-{chunk_size}-{overlap}"
+        collection = build_collection(client, name, c_vecs)
+        results = collection.query(query_embeddings=q_vecs.tolist(), n_results=k_eff)
+        rankings = [[int(i) for i in ids] for ids in results["ids"]]
+        latency_by_k = {top_k: time_search(collection, q_vecs, min(top_k, k_eff), repeats) for top_k in top_ks}
+        client.delete_collection(name=name)
+
+        # Per question, per rank: {clause index: end of its matched span in the untrimmed chunk}
+        spans = [
+            [
+                {ci: end for ci, clause in enumerate(item["clauses"])
+                 if (end := clause_span_end(texts[idx], clause)) is not None}
+                for idx in ranking
+            ]
+            for item, ranking in zip(labels, rankings)
+        ]
+
+        for trim in trims:
+            trimmed = {idx: trim_chunk(texts[idx], trim) for ranking in rankings for idx in ranking}
+            # A hit survives trimming only if the whole matched span is still in the prompt
+            hits = [
+                [{ci for ci, end in matched.items() if not trim or end <= trim} for matched in per_rank]
+                for per_rank in spans
+            ]
+
+            for top_k in top_ks:
+                k = min(top_k, k_eff)
+                recall, rr, tokens = [], [], []
+                for item, ranking, per_rank in zip(labels, rankings, hits):
+                    found = set().union(*per_rank[:k]) if k else set()
+                    recall.append(len(found) / len(item["clauses"]))
+                    first = next((r for r, matched in enumerate(per_rank[:k], 1) if matched), None)
+                    rr.append(1 / first if first else 0.0)
+                    tokens.append(sum(len(encoder.encode(trimmed[idx])) for idx in ranking[:k]))
+                rows.append({
+                    "chunk_size": chunk_size,
+                    "overlap": overlap,
+                    "trim": trim,
+                    "top_k": top_k,
+                    "chunks": len(texts),
+                    "recall": round(float(np.mean(recall)), 4),
+                    "mrr": round(float(np.mean(rr)), 4),
+                    "prompt_tokens": round(float(np.mean(tokens)), 1),
+                    "latency_ms": round(latency_by_k[top_k], 3),
+                })
+
+    cache.save()
+    pareto_front(rows)
+    return rows
+
+
+def print_table(rows: list[dict]):
+    header = f"{'':2}{'chunk':>6}{'ovl':>5}{'trim':>6}{'k':>4}{'chunks':>8}{'recall@k':>10}{'MRR':>8}{'tokens':>9}{'search ms':>11}"
+    print(header)
+    print("-" * len(header))
+    for r in sorted(rows, key=lambda r: (not r["pareto"], -r["recall"], r["prompt_tokens"], r["latency_ms"])):
+        print(f"{'★' if r['pareto'] else ' ':2}{r['chunk_size']:>6}{r['overlap']:>5}{r['trim'] or '-':>6}{r['top_k']:>4}"
+              f"{r['chunks']:>8}{r['recall']:>10.3f}{r['mrr']:>8.3f}{r['prompt_tokens']:>9.1f}{r['latency_ms']:>11.3f}")
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep chunking/retrieval parameters against a labelled question->clause set.")
+    parser.add_argument("labels", help="JSONL (or JSON list) of {question, clauses}")
+    parser.add_argument("--docs", default="doc/", help="directory of source documents")
+    parser.add_argument("--chunk-sizes", type=_int_list, default=[300, 500, 800])
+    parser.add_argument("--overlaps", type=_int_list, default=[50, 100])
+    parser.add_argument("--trims", type=_int_list, default=[200, 400, 0])
+    parser.add_argument("--top-ks", type=_int_list, default=[3, 5, 8])
+    parser.add_argument("--min-recall", type=float, default=None,
+                        help="accuracy bar; recommends the smallest-prompt config that meets it")
+    parser.add_argument("--out", default=None, help="optional CSV output path")
+    args = parser.parse_args()
+
+    doc_paths = sorted(
+        p for ext in ("pdf", "docx", "txt", "md") for p in glob.glob(os.path.join(args.docs, f"*.{ext}"))
+    )
+    if not doc_paths:
+        raise SystemExit(f"No documents found in {args.docs}")
+
+    labels = load_labels(args.labels)
+    print(f"📄 {len(doc_paths)} documents, ❓ {len(labels)} labelled questions")
+    rows = sweep(labels, doc_paths, args.chunk_sizes, args.overlaps, args.trims, args.top_ks)
+
+    print(f"\n📊 Retrieval sweep ({EMBED_MODEL}) — ★ = Pareto-optimal\n")
+    print_table(rows)
+
+    if args.min_recall is not None:
+        eligible = [r for r in rows if r["recall"] >= args.min_recall]
+        if eligible:
+            # Prompt tokens dominate end-to-end latency (LLM time); search latency only breaks ties
+            best = min(eligible, key=lambda r: (r["prompt_tokens"], r["chunks"], r["latency_ms"]))
+            print(f"\n✅ Smallest-prompt config with recall@k >= {args.min_recall}: "
+                  f"chunk_size={best['chunk_size']} overlap={best['overlap']} trim={best['trim'] or 'none'} top_k={best['top_k']}")
+        else:
+            print(f"\n⚠️ No configuration reaches recall@k >= {args.min_recall}")
+
+    if args.out and rows:
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"💾 Saved {len(rows)} rows to {args.out}")
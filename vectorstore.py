@@ -0,0 +1,135 @@
+# vectorstore.py
+# NDRA | Vector-store client layer: embedded (PersistentClient) or pooled keep-alive HTTP
+
+import os
+import functools
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "embedded": in-process PersistentClient over CHROMA_PATH (single-node deployments).
+#             The store must already be populated (CHROMA_MODE=embedded python embeddings.py,
+#             or python vsbench.py --sync to mirror the remote server); the chroma_db/
+#             shipped in the repo is only a bare HNSW segment and opens as empty.
+# "http":     remote Chroma server with a tuned, reused keep-alive session
+CHROMA_MODE = os.getenv("CHROMA_MODE", "http").lower()
+CHROMA_PATH = os.getenv("CHROMA_PATH", "chroma_db")
+
+CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", 8000))
+CHROMA_SSL = os.getenv("CHROMA_SSL", "False").lower() == "true"
+CHROMA_TIMEOUT = float(os.getenv("CHROMA_TIMEOUT", 10))   # seconds per HTTP request
+CHROMA_RETRIES = int(os.getenv("CHROMA_RETRIES", 3))      # on connection failures only
+CHROMA_POOL_SIZE = int(os.getenv("CHROMA_POOL_SIZE", 16))  # keep-alive connections kept open
+
+# Sentence-transformers model for BOTH sides of retrieval: chunk vectors (embeddings.py,
+# ingestion jobs) and query vectors (ragqexec.py via embed_query, ragsweep.py). Vectors
+# from different models are not comparable, so this is the single place it is configured.
+EMBED_MODEL = os.getenv("NDRA_EMBED_MODEL", "all-MiniLM-L6-v2")
+
+_client = None
+_client_lock = threading.Lock()
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def embed_query(text: str) -> list:
+    """Query vector in the same space as the indexed chunks (EMBED_MODEL, loaded once per process)."""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                from sentence_transformers import SentenceTransformer
+                _embedder = SentenceTransformer(EMBED_MODEL)
+    vector = _embedder.encode(text, show_progress_bar=False)
+    return vector.tolist() if hasattr(vector, "tolist") else vector
+
+
+def _tune_http_session(client):
+    """Mount a pooled adapter with retries and a default timeout on the client's requests.Session."""
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = getattr(getattr(client, "_server", None), "_session", None)
+    if session is None:
+        print("⚠️ Chroma HTTP session not found; running without pool/retry tuning")
+        return
+
+    # Only retry when the request never reached the server: a 5xx after a POST such as
+    # create_collection may have been applied, and repeating it is not safe.
+    retry = Retry(
+        total=CHROMA_RETRIES,
+        connect=CHROMA_RETRIES,
+        read=0,
+        status=0,
+        other=0,
+        backoff_factor=0.2,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=CHROMA_POOL_SIZE, pool_maxsize=CHROMA_POOL_SIZE, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    request = session.request
+
+    @functools.wraps(request)
+    def request_with_timeout(method, url, **kwargs):
+        kwargs.setdefault("timeout", CHROMA_TIMEOUT)
+        return request(method, url, **kwargs)
+
+    session.request = request_with_timeout
+
+
+def make_client(mode: str = None):
+    """Create a new Chroma client for the given mode (defaults to CHROMA_MODE)."""
+    mode = (mode or CHROMA_MODE).lower()
+    if mode == "embedded":
+        from chromadb import PersistentClient
+        print("Opening embedded Chroma at:", CHROMA_PATH)
+        return PersistentClient(path=CHROMA_PATH)
+
+    elif mode == "http":
+        from chromadb import HttpClient
+        print("Connecting to:", CHROMA_HOST, CHROMA_PORT, CHROMA_SSL)
+        client = HttpClient(host=CHROMA_HOST, port=CHROMA_PORT, ssl=CHROMA_SSL)
+        _tune_http_session(client)
+        return client
+
+    elif mode == "ephemeral":
+        # In-memory embedded store (same HNSW engine, nothing on disk): offline evaluation only
+        from chromadb import EphemeralClient
+        return EphemeralClient()
+
+    else:
+        raise ValueError(f"Unsupported CHROMA_MODE: {mode}")
+
+
+def get_client():
+    """Process-wide shared client: one embedded store or one pooled HTTP session per process."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = make_client()
+    return _client
+
+
+def open_serving_collection(client, name: str):
+    """Collection that queries read from. Embedded mode never creates it: an empty local store fails loudly."""
+    if CHROMA_MODE != "embedded":
+        return client.get_or_create_collection(name=name)
+
+    try:
+        collection = client.get_collection(name=name)
+    except Exception as e:
+        raise RuntimeError(
+            f"Embedded Chroma at '{CHROMA_PATH}' has no collection '{name}'. Populate it first "
+            "(CHROMA_MODE=embedded python embeddings.py, or python vsbench.py --sync)."
+        ) from e
+    if collection.count() == 0:
+        raise RuntimeError(
+            f"Embedded Chroma collection '{name}' at '{CHROMA_PATH}' is empty. Populate it first "
+            "(CHROMA_MODE=embedded python embeddings.py, or python vsbench.py --sync)."
+        )
+    return collection
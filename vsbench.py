@@ -0,0 +1,86 @@
+# vsbench.py
+# NDRA | Vector search latency: embedded PersistentClient vs. pooled HTTP client, side by side
+#
+# Usage: python vsbench.py [n_queries] [--sync]
+#   --sync  copy the remote collection into the embedded store first so both
+#           modes search the same data (otherwise each uses what it already has)
+
+import sys
+import time
+import statistics
+from vectorstore import make_client
+
+COLLECTION = "ndr_chunks"
+TOP_K = 5
+COPY_BATCH = 1000
+
+
+def sync_remote_to_embedded(remote, local):
+    source = remote.get_collection(name=COLLECTION)
+    try:
+        local.delete_collection(name=COLLECTION)
+    except Exception:
+        pass
+    target = local.create_collection(name=COLLECTION)
+    total = source.count()
+    for offset in range(0, total, COPY_BATCH):
+        batch = source.get(limit=COPY_BATCH, offset=offset, include=["documents", "embeddings", "metadatas"])
+        target.add(ids=batch["ids"], documents=batch["documents"],
+                   embeddings=batch["embeddings"], metadatas=batch["metadatas"])
+    print(f"🔁 Synced {total} records into the embedded store")
+
+
+def sample_vectors(collection, n: int) -> list:
+    # Stored embeddings double as realistic query vectors (no embedding model needed)
+    stored = collection.get(limit=max(1, min(n, 256)), include=["embeddings"])["embeddings"]
+    if not stored:
+        raise ValueError(f"Collection '{COLLECTION}' is empty")
+    return [stored[i % len(stored)] for i in range(n)]
+
+
+def time_queries(collection, vectors) -> list:
+    collection.query(query_embeddings=[vectors[0]], n_results=TOP_K)  # warm-up (connection / index load)
+    latencies = []
+    for vec in vectors:
+        start = time.perf_counter()
+        collection.query(query_embeddings=[vec], n_results=TOP_K)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarise(latencies: list) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "mean": statistics.mean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    n = int(args[0]) if args else 200
+
+    clients = {}
+    for mode in ("http", "embedded"):
+        try:
+            clients[mode] = make_client(mode)
+        except Exception as e:
+            print(f"⚠️ {mode} client unavailable: {e}")
+
+    if "--sync" in sys.argv and len(clients) == 2:
+        sync_remote_to_embedded(clients["http"], clients["embedded"])
+
+    results = {}
+    for mode, client in clients.items():
+        try:
+            collection = client.get_collection(name=COLLECTION)
+            results[mode] = summarise(time_queries(collection, sample_vectors(collection, n)))
+        except Exception as e:
+            print(f"⚠️ {mode} benchmark skipped: {e}")
+
+    print(f"\n📊 Vector search latency (ms), {n} queries, top_k={TOP_K}")
+    print(f"{'metric':<8}" + "".join(f"{mode:>12}" for mode in results))
+    for metric in ("mean", "p50", "p95", "max"):
+        print(f"{metric:<8}" + "".join(f"{results[mode][metric]:>12.2f}" for mode in results))